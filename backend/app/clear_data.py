@@ -1,5 +1,8 @@
-from datetime import datetime
-from app.db import connect_mongodb
+import logging
+
+from app.db import connect_mongodb, ensure_indexes
+
+log = logging.getLogger(__name__)
 
 def clear_database():
     """Completely clears all weather data from MongoDB"""
@@ -10,11 +13,15 @@ def clear_database():
         if collection is None:
             raise ValueError("MongoDB collection not available")
         
-        result = collection.delete_many({})
-        print(f"✅ MongoDB: Deleted {result.deleted_count} weather records")
+        # drop() is a metadata-only operation on the server, unlike
+        # delete_many({}) which walks and oplogs every document
+        deleted_count = collection.estimated_document_count()
+        collection.drop()
+        ensure_indexes()
+        log.info("✅ MongoDB: Dropped weather collection (%s records)", deleted_count)
         
-        return result.deleted_count
+        return deleted_count
         
     except Exception as e:
-        print(f"❌ Error clearing database: {str(e)}")
+        log.error("❌ Error clearing database: %s", e)
         raise
\ No newline at end of file
@@ -1,12 +1,73 @@
-from pymongo import MongoClient
+import logging
+import threading
+
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.write_concern import WriteConcern
 from app.config import MONGODB_URI, MONGODB_DB
 
+log = logging.getLogger(__name__)
+
+# Single shared client for the whole process. PyMongo keeps its own
+# connection pool, so building a new MongoClient per call would redo
+# server discovery and the TCP handshake on every insert.
+_client = None
+_client_lock = threading.Lock()
+
+def _get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGODB_URI,
+                    maxPoolSize=50,
+                    minPoolSize=5,
+                    appname="cloudwatch",
+                )
+                _ensure_indexes(_client)
+    return _client
+
+def ensure_indexes():
+    """Recreate the weather indexes on the shared client"""
+    try:
+        _ensure_indexes(_get_client())
+    except Exception as e:
+        log.error("Error creating MongoDB indexes: %s", e)
+
+def _ensure_indexes(client):
+    """Create the weather indexes (idempotent, safe to run every boot)"""
+    try:
+        collection = client[MONGODB_DB]["weather"]
+        collection.create_index([("timestamp", DESCENDING)])
+        collection.create_index([("city", ASCENDING), ("timestamp", DESCENDING)])
+        collection.create_index([("location", "2dsphere"), ("timestamp", DESCENDING)])
+        collection.create_index([("grid", ASCENDING), ("timestamp", DESCENDING)])
+    except Exception as e:
+        log.error("Error creating MongoDB indexes: %s", e)
+
 # Connect to MongoDB
 def connect_mongodb():
     try:
-        client = MongoClient(MONGODB_URI)  # Make sure this is correct
+        client = _get_client()
         db = client[MONGODB_DB]  # Access the database
         return db["weather"]  # Return the 'weather' collection
     except Exception as e:
-        print(f"Error connecting to MongoDB: {e}")
-        return None
\ No newline at end of file
+        log.error("Error connecting to MongoDB: %s", e)
+        return None
+
+def connect_mongodb_fast():
+    """
+    'weather' collection handle with w=0 (fire-and-forget) writes
+
+    Skips the per-insert server acknowledgement, which is fine for
+    high-frequency weather samples where losing the odd document is
+    acceptable. Use connect_mongodb() for anything that must not be
+    lost.
+    """
+    try:
+        client = _get_client()
+        db = client[MONGODB_DB]
+        return db.get_collection("weather", write_concern=WriteConcern(w=0))
+    except Exception as e:
+        log.error("Error connecting to MongoDB: %s", e)
+        return None
@@ -1,34 +1,137 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import aiohttp
+import orjson
 import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timezone, timedelta
+from app.config import API_KEY
 from app.store_data import store_weather_mongodb
 
-API_KEY = "fb23af25eda4f16a60eb16a48f7ca7e8"
+log = logging.getLogger(__name__)
+
+# URL templates and timezone constant built once at import instead of
+# re-assembled inside every call
+_WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather?lat={}&lon={}&appid=" + API_KEY + "&units=metric"
+_AQI_URL = "http://api.openweathermap.org/data/2.5/air_pollution?lat={}&lon={}&appid=" + API_KEY
+_UTC = timezone.utc
+
+# Shared session for the sync fetch path. HTTP keep-alive amortizes the
+# TCP handshake and DNS lookup across the weather/AQI/geo requests, and
+# the retry policy absorbs transient upstream errors.
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504)),
+)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+# (connect, read) timeouts for every outbound request
+_TIMEOUT = (3.05, 10)
+
+# Shared aiohttp session for the async fetch path. Reusing one session
+# keeps connections to api.openweathermap.org alive across calls.
+_aiohttp_session = None
+
+def _get_aiohttp_session():
+    global _aiohttp_session
+    if _aiohttp_session is None or _aiohttp_session.closed:
+        _aiohttp_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+    return _aiohttp_session
+
+async def close_aiohttp_session():
+    """Close the shared session (call on application shutdown)"""
+    global _aiohttp_session
+    if _aiohttp_session is not None and not _aiohttp_session.closed:
+        await _aiohttp_session.close()
+    _aiohttp_session = None
+
+# OpenWeather's free tier refreshes observations roughly every 10
+# minutes, so repeat fetches for the same coordinates within a few
+# minutes would return identical data. A short TTL cache keyed on the
+# rounded coordinates short-circuits the whole HTTP path for poll
+# bursts.
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "300"))
+_weather_cache = TTLCache(maxsize=1024, ttl=WEATHER_CACHE_TTL)
+_weather_cache_lock = threading.Lock()
+
+# The server's public IP (and therefore ipapi.co's answer) effectively
+# never changes within a day, so cache the lookup instead of paying a
+# few hundred ms per call. Stored as (location, expires_at).
+GEO_CACHE_TTL = 86400  # 24 hours
+_geo_cache = None
+_geo_cache_lock = threading.Lock()
 
 def get_user_location():
     """
     Get user's location using IP-based geolocation
     Returns tuple (latitude, longitude) or None if failed
     """
+    global _geo_cache
+
+    with _geo_cache_lock:
+        if _geo_cache is not None and _geo_cache[1] > time.monotonic():
+            return _geo_cache[0]
+
+    location = _lookup_user_location()
+
+    if location is not None:
+        with _geo_cache_lock:
+            _geo_cache = (location, time.monotonic() + GEO_CACHE_TTL)
+
+    return location
+
+def _lookup_user_location():
     try:
         # Using ipapi.co for IP-based geolocation (free service)
-        response = requests.get("https://ipapi.co/json/", timeout=10)
+        response = _session.get("https://ipapi.co/json/", timeout=_TIMEOUT)
         
         if response.status_code == 200:
-            location_data = response.json()
+            location_data = orjson.loads(response.content)
             latitude = location_data.get("latitude")
             longitude = location_data.get("longitude")
             
             if latitude is not None and longitude is not None:
-                print(f"📍 Detected location: {location_data.get('city', 'Unknown')}, {location_data.get('country_name', 'Unknown')}")
+                log.info("📍 Detected location: %s, %s", location_data.get('city', 'Unknown'), location_data.get('country_name', 'Unknown'))
                 return float(latitude), float(longitude)
         
-        print("⚠️ Could not detect location from IP")
+        log.warning("⚠️ Could not detect location from IP")
         return None
         
     except Exception as e:
-        print(f"❗ Error getting user location: {str(e)}")
+        log.error("❗ Error getting user location: %s", e)
         return None
 
+def _build_weather_info(weather):
+    """Build the weather dict from a raw OpenWeather /weather payload"""
+    return {
+        "latitude": weather.get("coord", {}).get("lat"),
+        "longitude": weather.get("coord", {}).get("lon"),
+        "city": weather.get("name", "Unknown"),
+        "country": weather.get("sys", {}).get("country", "Unknown"),
+        "condition": weather.get("weather", [{}])[0].get("main", "Unknown"),
+        "description": weather.get("weather", [{}])[0].get("description", ""),
+        "temperature": weather.get("main", {}).get("temp"),
+        "feels_like": weather.get("main", {}).get("feels_like"),
+        "humidity": weather.get("main", {}).get("humidity"),
+        "pressure": weather.get("main", {}).get("pressure"),
+        "wind_speed": weather.get("wind", {}).get("speed"),
+        "wind_direction": weather.get("wind", {}).get("deg"),
+        "timestamp": datetime.fromtimestamp(weather.get("dt", 0), tz=_UTC),
+        "timezone_offset": weather.get("timezone", 0),
+    }
+
 def fetch_weather_data(latitude: float = None, longitude: float = None, use_user_location: bool = False):
     """
     Fetch weather data for given coordinates or user's current location
@@ -48,62 +151,153 @@ def fetch_weather_data(latitude: float = None, longitude: float = None, use_user
         if location:
             latitude, longitude = location
         elif latitude is None or longitude is None:
-            print("❗ No coordinates provided and couldn't detect user location")
+            log.warning("❗ No coordinates provided and couldn't detect user location")
             return None
     
     # Validate coordinates
     if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
         raise ValueError(f"Invalid coordinates: {latitude}, {longitude}")
     
+    cache_key = (round(latitude, 3), round(longitude, 3))
+    with _weather_cache_lock:
+        cached = _weather_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         # Get weather data
-        weather_url = f"http://api.openweathermap.org/data/2.5/weather?lat={latitude}&lon={longitude}&appid={API_KEY}&units=metric"
-        weather_response = requests.get(weather_url, timeout=10)
+        weather_url = _WEATHER_URL.format(latitude, longitude)
+        weather_response = _session.get(weather_url, timeout=_TIMEOUT)
 
         if weather_response.status_code != 200:
-            print(f"Error fetching weather data: {weather_response.status_code}")
+            log.error("Error fetching weather data: %s", weather_response.status_code)
             return None
 
-        weather = weather_response.json()
-
-        # Extract timezone offset (seconds)
-        timezone_offset = weather.get("timezone", 0)
-
-        # Base weather data
-        weather_info = {
-            "latitude": weather.get("coord", {}).get("lat"),
-            "longitude": weather.get("coord", {}).get("lon"),
-            "city": weather.get("name", "Unknown"),
-            "country": weather.get("sys", {}).get("country", "Unknown"),
-            "condition": weather.get("weather", [{}])[0].get("main", "Unknown"),
-            "description": weather.get("weather", [{}])[0].get("description", ""),
-            "temperature": weather.get("main", {}).get("temp"),
-            "feels_like": weather.get("main", {}).get("feels_like"),
-            "humidity": weather.get("main", {}).get("humidity"),
-            "pressure": weather.get("main", {}).get("pressure"),
-            "wind_speed": weather.get("wind", {}).get("speed"),
-            "wind_direction": weather.get("wind", {}).get("deg"),
-            "timestamp": datetime.fromtimestamp(weather.get("dt", 0), tz=timezone.utc),
-            "timezone_offset": timezone_offset,
-        }
+        weather = orjson.loads(weather_response.content)
+        weather_info = _build_weather_info(weather)
 
         # Get AQI data
-        aqi_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={latitude}&lon={longitude}&appid={API_KEY}"
-        aqi_response = requests.get(aqi_url, timeout=10)
+        aqi_url = _AQI_URL.format(latitude, longitude)
+        aqi_response = _session.get(aqi_url, timeout=_TIMEOUT)
         
         if aqi_response.status_code == 200:
-            aqi_data = aqi_response.json()
+            aqi_data = orjson.loads(aqi_response.content)
             weather_info["aqi"] = aqi_data.get("list", [{}])[0].get("main", {}).get("aqi")
         else:
-            print(f"AQI API error: {aqi_response.status_code}")
+            log.warning("AQI API error: %s", aqi_response.status_code)
             weather_info["aqi"] = None
 
+        with _weather_cache_lock:
+            _weather_cache[cache_key] = weather_info
+
         return weather_info
 
     except Exception as e:
-        print(f"Fetch error: {str(e)}")
+        log.error("Fetch error: %s", e)
         return None
 
+async def fetch_weather_data_async(latitude: float, longitude: float, session=None):
+    """
+    Async variant of fetch_weather_data for given coordinates
+
+    The weather and air-pollution requests are independent, so they are
+    issued concurrently — total latency is max(RTT) instead of sum(RTT).
+    Pass an explicit session to avoid the shared one, e.g. from a
+    different event loop.
+
+    Returns:
+        dict: Weather data or None if failed
+    """
+    # Validate coordinates
+    if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
+        raise ValueError(f"Invalid coordinates: {latitude}, {longitude}")
+
+    # Shares the TTL cache with the sync path, so back-to-back calls
+    # for the same point (user-weather then weather-alerts) hit once
+    cache_key = (round(latitude, 3), round(longitude, 3))
+    with _weather_cache_lock:
+        cached = _weather_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if session is None:
+        session = _get_aiohttp_session()
+
+    async def _get_json(url):
+        async with session.get(url) as response:
+            if response.status != 200:
+                return response.status, None
+            return response.status, await response.json(loads=orjson.loads)
+
+    try:
+        weather_url = _WEATHER_URL.format(latitude, longitude)
+        aqi_url = _AQI_URL.format(latitude, longitude)
+
+        (weather_status, weather), (aqi_status, aqi_data) = await asyncio.gather(
+            _get_json(weather_url), _get_json(aqi_url)
+        )
+
+        if weather is None:
+            log.error("Error fetching weather data: %s", weather_status)
+            return None
+
+        weather_info = _build_weather_info(weather)
+
+        if aqi_data is not None:
+            weather_info["aqi"] = aqi_data.get("list", [{}])[0].get("main", {}).get("aqi")
+        else:
+            log.warning("AQI API error: %s", aqi_status)
+            weather_info["aqi"] = None
+
+        with _weather_cache_lock:
+            _weather_cache[cache_key] = weather_info
+
+        return weather_info
+
+    except Exception as e:
+        log.error("Fetch error: %s", e)
+        return None
+
+async def fetch_many(coords, session=None):
+    """
+    Fetch weather for a list of (latitude, longitude) pairs concurrently
+
+    Returns:
+        list: One weather dict (or None) per coordinate pair, in order
+    """
+    results = await asyncio.gather(
+        *[fetch_weather_data_async(lat, lon, session=session) for lat, lon in coords],
+        return_exceptions=True,
+    )
+    return [None if isinstance(r, Exception) else r for r in results]
+
+def fetch_weather_batch(coords):
+    """
+    Fetch weather for many (latitude, longitude) pairs from sync code
+
+    OpenWeather's /group endpoint only accepts city IDs, which we never
+    have, so batching here means issuing all per-coordinate requests
+    concurrently over the shared session instead of one combined call.
+    Latency is ~1 round trip for the whole batch instead of N.
+
+    Returns:
+        list: One weather dict (or None) per coordinate pair, in order
+    """
+    if not coords:
+        return []
+
+    # Use a session of our own: the shared one may belong to another
+    # running loop (the server's), and closing it here would tear it
+    # down under in-flight handlers.
+    async def _run():
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as session:
+            return await fetch_many(coords, session=session)
+
+    return asyncio.run(_run())
+
 def insert_weather_data(data):
     """
     Store weather data in MongoDB (updated from PostgreSQL)
@@ -111,6 +305,15 @@ def insert_weather_data(data):
     """
     return store_weather_mongodb(data)
 
+async def insert_weather_data_async(data):
+    """
+    Run insert_weather_data in a worker thread
+
+    Bridge for async callers while the storage layer is still built on
+    blocking PyMongo — keeps the event loop free during the write.
+    """
+    return await asyncio.to_thread(insert_weather_data, data)
+
 def fetch_weather_postgresql():
     """
     Fetch latest weather data from MongoDB (updated from PostgreSQL)
@@ -121,12 +324,25 @@ def fetch_weather_postgresql():
         
         collection = connect_mongodb()
         if collection is None:
-            print("❗ Could not connect to MongoDB")
+            log.error("❗ Could not connect to MongoDB")
             return None
         
-        # Get latest weather record
-        latest = collection.find().sort("timestamp", -1).limit(1)
-        latest_record = next(latest, None)
+        # Get latest weather record — index-backed sort, and only pull
+        # the fields we actually display
+        latest_record = collection.find_one(
+            {},
+            projection={
+                "_id": 0,
+                "city": 1,
+                "country": 1,
+                "temperature": 1,
+                "condition": 1,
+                "description": 1,
+                "timestamp": 1,
+                "timezone_offset": 1,
+            },
+            sort=[("timestamp", -1)],
+        )
         
         if latest_record:
             # Convert timezone offset to proper timezone for display
@@ -134,16 +350,16 @@ def fetch_weather_postgresql():
                 timezone(timedelta(seconds=latest_record.get("timezone_offset", 0)))
             )
             
-            print(f"🌤️ Latest weather in {latest_record['city']}, {latest_record['country']}:")
-            print(f"  Temperature: {latest_record['temperature']}°C")
-            print(f"  Condition: {latest_record['condition']} ({latest_record['description']})")
-            print(f"  Recorded at: {local_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+            log.info("🌤️ Latest weather in %s, %s:", latest_record['city'], latest_record['country'])
+            log.info("  Temperature: %s°C", latest_record['temperature'])
+            log.info("  Condition: %s (%s)", latest_record['condition'], latest_record['description'])
+            log.info("  Recorded at: %s", local_time.strftime('%Y-%m-%d %H:%M:%S %Z'))
             
             return latest_record
         else:
-            print("📭 No weather records found in database")
+            log.info("📭 No weather records found in database")
             return None
             
     except Exception as e:
-        print(f"❗ Database read error: {str(e)}")
+        log.error("❗ Database read error: %s", e)
         return None
\ No newline at end of file
